@@ -12,6 +12,13 @@ class Settings(BaseModel):
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     database_url: str = os.getenv("DATABASE_URL", "postgresql://kushkapadia@localhost:5432/gatekeeper")
     policy_version: str = os.getenv("POLICY_VERSION", "v0")
+    # Shadow evaluation of a candidate policy version (disabled when unset or rate is 0)
+    shadow_policy_version: str = os.getenv("SHADOW_POLICY_VERSION", "")
+    shadow_sample_rate: float = float(os.getenv("SHADOW_SAMPLE_RATE", "0"))
+    shadow_workers: int = int(os.getenv("SHADOW_WORKERS", "2"))
+    shadow_max_pending: int = int(os.getenv("SHADOW_MAX_PENDING", "100"))
+    shadow_flush_seconds: int = int(os.getenv("SHADOW_FLUSH_SECONDS", "60"))
+    shadow_tenant_id: str = os.getenv("SHADOW_TENANT_ID", "00000000-0000-0000-0000-000000000000")
 
 
 settings = Settings()
@@ -0,0 +1,108 @@
+from typing import Any, Dict, Optional
+import hashlib
+
+import msgpack
+import orjson
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import ValidationError
+
+from ..models.types import EnforcementRequest
+
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def wants_msgpack(header_value: Optional[str]) -> bool:
+    """True if a Content-Type/Accept header names a MessagePack media type with q > 0."""
+    if not header_value:
+        return False
+    for entry in header_value.split(","):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        if media_type.lower() not in MSGPACK_MEDIA_TYPES:
+            continue
+        q = next((p.split("=", 1)[1] for p in params if p.lower().startswith("q=")), "1")
+        try:
+            if float(q) > 0:
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def _find_non_json(value: Any, path: tuple = ()) -> Optional[tuple]:
+    """Path of the first MessagePack value JSON cannot carry (bin/ext data, non-str keys)."""
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if not isinstance(k, str):
+                return path
+            found = _find_non_json(v, path + (k,))
+            if found is not None:
+                return found
+        return None
+    if isinstance(value, list):
+        for i, v in enumerate(value):
+            found = _find_non_json(v, path + (i,))
+            if found is not None:
+                return found
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return None
+    return path
+
+
+async def decode_enforcement_request(request: Request) -> EnforcementRequest:
+    """Parse the /v1/enforce body as MessagePack or JSON based on Content-Type.
+
+    Failures surface as FastAPI's usual structured 422 body.
+    """
+    body = await request.body()
+    try:
+        if wants_msgpack(request.headers.get("content-type")):
+            try:
+                data = msgpack.unpackb(body, raw=False)
+            except ValueError as e:
+                # msgpack's unpack errors (ExtraData, FormatError, incomplete input) are ValueErrors
+                raise RequestValidationError([{"type": "msgpack_invalid", "loc": ("body",), "msg": f"Invalid MessagePack: {e}", "input": None}])
+            # Only accept what JSON could express, so bin/ext values never reach
+            # the error encoder or the orjson response path
+            bad_path = _find_non_json(data)
+            if bad_path is not None:
+                raise RequestValidationError([{"type": "msgpack_unsupported_type", "loc": ("body", *bad_path), "msg": "MessagePack bin/ext values and non-string map keys are not supported", "input": None}])
+            return EnforcementRequest.model_validate(data)
+        return EnforcementRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+
+
+def encode_response(payload: Dict[str, Any], accept: Optional[str]) -> Response:
+    """Serialize a plain response dict as MessagePack or JSON based on Accept."""
+    if wants_msgpack(accept):
+        return MsgPackResponse(content=payload)
+    return ORJSONResponse(content=payload)
+
+
+def enforcement_request_body() -> Dict[str, Any]:
+    """OpenAPI requestBody for routes that decode EnforcementRequest themselves."""
+    schema = EnforcementRequest.model_json_schema()
+    return {
+        "required": True,
+        "content": {
+            "application/json": {"schema": schema},
+            "application/msgpack": {"schema": schema},
+        },
+    }
+
+
+def policy_context_ref(policy_context: Dict[str, Any]) -> str:
+    """Stable content hash clients can cache a policyContext under."""
+    canonical = orjson.dumps(policy_context, option=orjson.OPT_SORT_KEYS)
+    return "sha256:" + hashlib.sha256(canonical).hexdigest()
@@ -1,18 +1,30 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from .models.types import EnforcementRequest, EnforcementResponse
+from .core.wire import decode_enforcement_request, encode_response, enforcement_request_body, policy_context_ref
 from .policies.repository import fetch_applicable_distilled_prompts
 from .policies.context_builder import build_policy_context
 from .policies.evaluator import evaluate
 from .policies.validator import lint_policies
+from .policies.shadow import aggregator as shadow_aggregator, should_shadow, shutdown_shadow, start_shadow_flusher, submit_shadow
 from mcp.server.main import policy_test, policy_simulate
 from .auth.auth import authenticate_tenant, create_jwt_token, verify_jwt_token
 from fastapi import Header, Depends
+from contextlib import asynccontextmanager
 from typing import Optional
+import time
 
-app = FastAPI(title="GateKeeper Enforcement API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_shadow_flusher()
+    yield
+    shutdown_shadow()
+
+
+app = FastAPI(title="GateKeeper Enforcement API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -53,24 +65,42 @@ def login(payload: dict):
     return {"token": token, "tenant": tenant}
 
 
-@app.post("/v1/enforce", response_model=EnforcementResponse)
-def enforce(req: EnforcementRequest) -> EnforcementResponse:
+@app.post("/v1/enforce", response_model=EnforcementResponse, openapi_extra={"requestBody": enforcement_request_body()})
+def enforce(req: EnforcementRequest = Depends(decode_enforcement_request), accept: Optional[str] = Header(None)) -> Response:
     # Stub enforcement: echo back with allowed decision
     # Evaluate basic policies (block/rewrite) and get changes
+    started = time.perf_counter()
     decision, changes, trace = evaluate(req.stage, req.user, req.request)
+    primary_ms = (time.perf_counter() - started) * 1000.0
 
     # Build distilled policy context for LLM prompt
     prompts = fetch_applicable_distilled_prompts(req.stage, req.user, req.request)
     policy_context = build_policy_context(req.user, prompts, role_scope={"role": req.user.get("role"), "department": req.user.get("department")}) if prompts else None
 
-    return EnforcementResponse(
-        decision=decision,
-        data=changes or {},
-        auditId="audit-stub",
-        trace=trace,
-        policyContext=policy_context,
+    # Skip re-sending the policyContext body when the caller already holds it
+    context_ref = policy_context_ref(policy_context) if policy_context else None
+    if context_ref and context_ref == req.policyContextRef:
+        policy_context = None
+
+    # Plain dict straight to orjson/msgpack; the response model only documents the shape
+    response = encode_response(
+        {
+            "decision": decision,
+            "data": changes or {},
+            "auditId": "audit-stub",
+            "trace": [{"policy": t["policy"], "action": t["action"], "details": t.get("details", {})} for t in trace],
+            "policyContext": policy_context,
+            "policyContextRef": context_ref,
+        },
+        accept,
     )
 
+    # Sampled shadow evaluation against the candidate version; only enqueues, the
+    # candidate runs on the shadow pool off the request path
+    if should_shadow():
+        submit_shadow(req.stage, req.user, req.request, (decision, changes, trace), primary_ms, req.correlationId)
+    return response
+
 
 # Studio API endpoints
 @app.post("/api/policies/lint")
@@ -106,6 +136,12 @@ def get_risky_users(window: str = "24h", limit: int = 10):
     return {"users": []}
 
 
+@app.get("/api/analytics/shadow")
+def get_shadow_window():
+    # Current unflushed window; flushed windows live in analytics_snapshots (kind=shadow_eval)
+    return shadow_aggregator.snapshot()
+
+
 @app.put("/api/schema/descriptor")
 def update_descriptor(payload: dict, tenant: dict = Depends(get_current_tenant)):
     from .policies.descriptor import save_descriptor
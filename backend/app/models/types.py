@@ -13,6 +13,8 @@ class EnforcementRequest(BaseModel):
     artifacts: Optional[Dict[str, Any]] = None
     policyVersion: Optional[str] = None
     correlationId: Optional[str] = None
+    # Ref of a policyContext the caller already holds; a match omits the body
+    policyContextRef: Optional[str] = None
 
 
 class TraceItem(BaseModel):
@@ -27,5 +29,6 @@ class EnforcementResponse(BaseModel):
     auditId: str
     trace: List[TraceItem] = Field(default_factory=list)
     policyContext: Optional[Dict[str, Any]] = None
+    policyContextRef: Optional[str] = None
 
 
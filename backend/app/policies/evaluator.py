@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import json
 
 from .actions import action_block, action_rewrite_query, action_add_filters
@@ -7,16 +7,17 @@ from ..core.config import settings
 from .path_resolver import eval_expr, get_by_path
 
 
-def evaluate(stage: str, user: Dict[str, Any], request: Dict[str, Any]) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+def evaluate(stage: str, user: Dict[str, Any], request: Dict[str, Any], policy_version: Optional[str] = None) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
     """Evaluate policies generically from DB for block/rewrite actions.
 
+    policy_version defaults to settings.policy_version.
     Returns (decision, data_changes, trace)
     """
     trace: List[Dict[str, Any]] = []
     decision: str = "allowed"
     changes: Dict[str, Any] = {}
 
-    policies = fetch_policies_for_stage(stage, settings.policy_version)
+    policies = fetch_policies_for_stage(stage, policy_version or settings.policy_version)
     ctx = {"user": user or {}, "request": request or {}, "artifacts": (request or {}).get("artifacts", {})}
     q_text = str(get_by_path(ctx, "request.query") or "")
     for content, _distilled, _prio in policies:
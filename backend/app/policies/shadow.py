@@ -0,0 +1,226 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import random
+import threading
+import time
+
+import psycopg
+
+from ..audit.logger import get_logger
+from ..core.config import settings
+from .evaluator import evaluate
+
+
+# Upper bounds (ms) of the latency histogram buckets; anything slower lands in "gt_1000"
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+MAX_DIFF_EXAMPLES = 20
+SNAPSHOT_KIND = "shadow_eval"
+
+Result = Tuple[str, Dict[str, Any], List[Dict[str, Any]]]
+
+logger = get_logger()
+
+
+def _bucket(ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if ms <= bound:
+            return f"le_{bound}"
+    return f"gt_{LATENCY_BUCKETS_MS[-1]}"
+
+
+def _trace_key(trace: List[Dict[str, Any]]) -> List[Tuple[Any, Any]]:
+    return [(t.get("policy"), t.get("action")) for t in trace]
+
+
+class ShadowAggregator:
+    """In-memory decision/trace diffs and latency histograms for one flush window.
+
+    Windows are written to analytics_snapshots (kind=shadow_eval) by flush(),
+    driven by the periodic flusher thread.
+    """
+
+    def __init__(self, primary_version: str, candidate_version: str, flush_seconds: int, tenant_id: str) -> None:
+        self.primary_version = primary_version
+        self.candidate_version = candidate_version
+        self.flush_seconds = flush_seconds
+        self.tenant_id = tenant_id
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._window_start = datetime.now(timezone.utc)
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._examples: List[Dict[str, Any]] = []
+        self._errors = 0
+        self._dropped = 0
+
+    def _stage(self, stage: str) -> Dict[str, Any]:
+        if stage not in self._stages:
+            self._stages[stage] = {
+                "sampled": 0,
+                "decision_diffs": 0,
+                "trace_diffs": 0,
+                "data_diffs": 0,
+                "decision_pairs": {},
+                "latency_ms": {
+                    self.primary_version: {"count": 0, "sum": 0.0, "max": 0.0, "buckets": {}},
+                    self.candidate_version: {"count": 0, "sum": 0.0, "max": 0.0, "buckets": {}},
+                },
+            }
+        return self._stages[stage]
+
+    def _observe(self, hist: Dict[str, Any], ms: float) -> None:
+        hist["count"] += 1
+        hist["sum"] += ms
+        hist["max"] = max(hist["max"], ms)
+        b = _bucket(ms)
+        hist["buckets"][b] = hist["buckets"].get(b, 0) + 1
+
+    def record(self, stage: str, primary: Result, candidate: Result, primary_ms: float, candidate_ms: float, correlation_id: Optional[str] = None) -> None:
+        p_decision, p_data, p_trace = primary
+        c_decision, c_data, c_trace = candidate
+        decision_diff = p_decision != c_decision
+        trace_diff = _trace_key(p_trace) != _trace_key(c_trace)
+        data_diff = (p_data or {}) != (c_data or {})
+        with self._lock:
+            st = self._stage(stage)
+            st["sampled"] += 1
+            st["decision_diffs"] += int(decision_diff)
+            st["trace_diffs"] += int(trace_diff)
+            st["data_diffs"] += int(data_diff)
+            pair = f"{p_decision}->{c_decision}"
+            st["decision_pairs"][pair] = st["decision_pairs"].get(pair, 0) + 1
+            # Equal versions would share one histogram; shadowing then is a no-op anyway
+            self._observe(st["latency_ms"][self.primary_version], primary_ms)
+            self._observe(st["latency_ms"][self.candidate_version], candidate_ms)
+            if (decision_diff or trace_diff) and len(self._examples) < MAX_DIFF_EXAMPLES:
+                self._examples.append({
+                    "stage": stage,
+                    "correlationId": correlation_id,
+                    "primary": {"decision": p_decision, "trace": p_trace},
+                    "candidate": {"decision": c_decision, "trace": c_trace},
+                })
+
+    def record_error(self) -> None:
+        with self._lock:
+            self._errors += 1
+
+    def record_dropped(self) -> None:
+        with self._lock:
+            self._dropped += 1
+
+    def _payload(self) -> Dict[str, Any]:
+        return {
+            "primary_version": self.primary_version,
+            "candidate_version": self.candidate_version,
+            "stages": self._stages,
+            "diff_examples": self._examples,
+            "errors": self._errors,
+            "dropped": self._dropped,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of the current (unflushed) window."""
+        with self._lock:
+            payload = json.loads(json.dumps(self._payload()))
+            payload["window_start"] = self._window_start.isoformat()
+            return payload
+
+    def flush(self, force: bool = False) -> None:
+        """Swap out the current window and persist it as an analytics snapshot.
+
+        Without force, only flushes once the window is flush_seconds old.
+        """
+        with self._lock:
+            if not self._stages and not self._errors and not self._dropped:
+                return
+            now = datetime.now(timezone.utc)
+            if not force and (now - self._window_start).total_seconds() < self.flush_seconds:
+                return
+            window_start = self._window_start
+            payload = self._payload()
+            self._reset()
+            window_end = self._window_start
+        try:
+            with psycopg.connect(settings.database_url) as conn:
+                conn.execute(
+                    """
+                    INSERT INTO analytics_snapshots (tenant_id, window_start, window_end, kind, payload)
+                    VALUES (%s, %s, %s, %s, %s::jsonb)
+                    """,
+                    (self.tenant_id, window_start, window_end, SNAPSHOT_KIND, json.dumps(payload)),
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning("shadow_flush_failed", error=str(e))
+
+
+aggregator = ShadowAggregator(
+    primary_version=settings.policy_version,
+    candidate_version=settings.shadow_policy_version,
+    flush_seconds=settings.shadow_flush_seconds,
+    tenant_id=settings.shadow_tenant_id,
+)
+_executor = ThreadPoolExecutor(max_workers=max(1, settings.shadow_workers), thread_name_prefix="shadow")
+_pending = threading.BoundedSemaphore(max(1, settings.shadow_max_pending))
+_flush_stop = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+
+def shadow_enabled() -> bool:
+    return bool(settings.shadow_policy_version) and settings.shadow_policy_version != settings.policy_version and settings.shadow_sample_rate > 0
+
+
+def should_shadow() -> bool:
+    """Per-request sampling decision; cheap enough for the hot path."""
+    return shadow_enabled() and random.random() < settings.shadow_sample_rate
+
+
+def submit_shadow(stage: str, user: Dict[str, Any], request: Dict[str, Any], primary: Result, primary_ms: float, correlation_id: Optional[str] = None) -> None:
+    """Queue a candidate-version evaluation; drops the sample if the pool is saturated."""
+    if not _pending.acquire(blocking=False):
+        aggregator.record_dropped()
+        return
+    try:
+        future = _executor.submit(_run_shadow, stage, user, request, primary, primary_ms, correlation_id)
+    except RuntimeError:
+        _pending.release()
+        return
+    future.add_done_callback(lambda _f: _pending.release())
+
+
+def _run_shadow(stage: str, user: Dict[str, Any], request: Dict[str, Any], primary: Result, primary_ms: float, correlation_id: Optional[str]) -> None:
+    start = time.perf_counter()
+    try:
+        candidate = evaluate(stage, user, request, policy_version=settings.shadow_policy_version)
+    except Exception as e:
+        aggregator.record_error()
+        logger.warning("shadow_eval_failed", stage=stage, version=settings.shadow_policy_version, error=str(e))
+        return
+    candidate_ms = (time.perf_counter() - start) * 1000.0
+    aggregator.record(stage, primary, candidate, primary_ms, candidate_ms, correlation_id)
+
+
+def _flush_loop(interval: float) -> None:
+    while not _flush_stop.wait(interval):
+        aggregator.flush(force=True)
+
+
+def start_shadow_flusher() -> None:
+    """Start the daemon thread that writes a snapshot every SHADOW_FLUSH_SECONDS."""
+    global _flusher
+    if not shadow_enabled() or (_flusher is not None and _flusher.is_alive()):
+        return
+    _flush_stop.clear()
+    _flusher = threading.Thread(target=_flush_loop, args=(max(1, settings.shadow_flush_seconds),), name="shadow-flush", daemon=True)
+    _flusher.start()
+
+
+def shutdown_shadow() -> None:
+    _flush_stop.set()
+    if _flusher is not None:
+        _flusher.join()
+    _executor.shutdown(wait=True, cancel_futures=True)
+    aggregator.flush(force=True)
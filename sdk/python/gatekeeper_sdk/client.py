@@ -1,13 +1,23 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import httpx
 
 
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
 class GateKeeperClient:
-    def __init__(self, base_url: str) -> None:
+    def __init__(self, base_url: str, wire_format: str = "json") -> None:
+        if wire_format not in ("json", "msgpack"):
+            raise ValueError("wire_format must be 'json' or 'msgpack'")
         self.base_url = base_url.rstrip("/")
+        self.wire_format = wire_format
+        # policyContext bodies by ref, and the last ref seen per (stage, role, department)
+        self._contexts: Dict[str, Dict[str, Any]] = {}
+        self._context_refs: Dict[Tuple[str, Any, Any], str] = {}
 
     def enforce(self, stage: str, user: Dict[str, Any], data: Dict[str, Any], artifacts: Optional[Dict[str, Any]] = None, policy_version: Optional[str] = None, correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        scope = (stage, (user or {}).get("role"), (user or {}).get("department"))
         payload = {
             "stage": stage,
             "user": user,
@@ -15,8 +25,32 @@ class GateKeeperClient:
             "artifacts": artifacts,
             "policyVersion": policy_version,
             "correlationId": correlation_id,
+            "policyContextRef": self._context_refs.get(scope),
         }
-        resp = httpx.post(f"{self.base_url}/v1/enforce", json=payload, timeout=10.0)
+        result = self._post("/v1/enforce", payload)
+
+        ref = result.get("policyContextRef")
+        if ref:
+            if result.get("policyContext") is not None:
+                self._contexts[ref] = result["policyContext"]
+            else:
+                result["policyContext"] = self._contexts.get(ref)
+            self._context_refs[scope] = ref
+        return result
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self.wire_format == "msgpack":
+            import msgpack
+
+            resp = httpx.post(
+                f"{self.base_url}{path}",
+                content=msgpack.packb(payload, use_bin_type=True),
+                headers={"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE},
+                timeout=10.0,
+            )
+            resp.raise_for_status()
+            return msgpack.unpackb(resp.content, raw=False)
+        resp = httpx.post(f"{self.base_url}{path}", json=payload, timeout=10.0)
         resp.raise_for_status()
         return resp.json()
 
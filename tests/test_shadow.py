@@ -0,0 +1,160 @@
+import threading
+
+import pytest
+
+from backend.app.core.config import settings
+from backend.app.policies import shadow
+from backend.app.policies.shadow import ShadowAggregator, _bucket
+
+
+ALLOWED = ("allowed", {}, [])
+BLOCKED = ("blocked", {"message": "no"}, [{"policy": "p", "action": "block"}])
+
+
+class _FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.rows.append((sql, params))
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def db_rows(monkeypatch):
+    rows = []
+    monkeypatch.setattr(shadow.psycopg, "connect", lambda url: _FakeConn(rows))
+    return rows
+
+
+@pytest.fixture
+def fresh_aggregator(monkeypatch):
+    agg = ShadowAggregator("v0", "v1", flush_seconds=60, tenant_id="t")
+    monkeypatch.setattr(shadow, "aggregator", agg)
+    return agg
+
+
+def test_bucket_bounds():
+    assert _bucket(0.4) == "le_1"
+    assert _bucket(7) == "le_10"
+    assert _bucket(5000) == "gt_1000"
+
+
+def test_aggregator_records_diffs_and_latency():
+    agg = ShadowAggregator("v0", "v1", flush_seconds=60, tenant_id="t")
+    agg.record("pre_query", ALLOWED, ALLOWED, 2.0, 3.0)
+    agg.record("pre_query", ALLOWED, BLOCKED, 2.0, 30.0, correlation_id="req-1")
+
+    snap = agg.snapshot()
+    st = snap["stages"]["pre_query"]
+    assert st["sampled"] == 2
+    assert st["decision_diffs"] == 1
+    assert st["trace_diffs"] == 1
+    assert st["decision_pairs"] == {"allowed->allowed": 1, "allowed->blocked": 1}
+    assert st["latency_ms"]["v1"]["count"] == 2
+    assert st["latency_ms"]["v1"]["buckets"] == {"le_5": 1, "le_50": 1}
+    assert snap["diff_examples"][0]["correlationId"] == "req-1"
+
+
+def test_flush_skips_empty_window(db_rows):
+    agg = ShadowAggregator("v0", "v1", flush_seconds=0, tenant_id="t")
+    agg.flush(force=True)
+    assert db_rows == []
+
+
+def test_flush_waits_for_window_unless_forced(db_rows):
+    agg = ShadowAggregator("v0", "v1", flush_seconds=60, tenant_id="t")
+    agg.record("pre_query", ALLOWED, BLOCKED, 1.0, 1.0)
+    agg.flush()
+    assert db_rows == []
+
+    agg.flush(force=True)
+    assert len(db_rows) == 1
+    _sql, (tenant_id, _start, _end, kind, payload) = db_rows[0]
+    assert tenant_id == "t"
+    assert kind == "shadow_eval"
+    assert '"decision_diffs": 1' in payload
+    assert agg.snapshot()["stages"] == {}
+
+
+def test_run_shadow_records_candidate_error(monkeypatch, fresh_aggregator):
+    def boom(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(shadow, "evaluate", boom)
+    shadow._run_shadow("pre_query", {}, {}, ALLOWED, 1.0, None)
+    snap = fresh_aggregator.snapshot()
+    assert snap["errors"] == 1
+    assert snap["stages"] == {}
+
+
+def test_run_shadow_evaluates_candidate_version(monkeypatch, fresh_aggregator):
+    versions = []
+
+    def fake_evaluate(stage, user, request, policy_version=None):
+        versions.append(policy_version)
+        return BLOCKED
+
+    monkeypatch.setattr(settings, "shadow_policy_version", "v1")
+    monkeypatch.setattr(shadow, "evaluate", fake_evaluate)
+    shadow._run_shadow("pre_query", {}, {}, ALLOWED, 1.0, "req-1")
+    assert versions == ["v1"]
+    assert fresh_aggregator.snapshot()["stages"]["pre_query"]["decision_diffs"] == 1
+
+
+def test_submit_shadow_drops_when_pool_saturated(monkeypatch, fresh_aggregator):
+    monkeypatch.setattr(shadow, "_pending", threading.BoundedSemaphore(1))
+    shadow._pending.acquire()
+    monkeypatch.setattr(shadow._executor, "submit", lambda *a, **k: pytest.fail("should not submit"))
+
+    shadow.submit_shadow("pre_query", {}, {}, ALLOWED, 1.0)
+    assert fresh_aggregator.snapshot()["dropped"] == 1
+
+
+def test_should_shadow_respects_config(monkeypatch):
+    monkeypatch.setattr(settings, "policy_version", "v0")
+    monkeypatch.setattr(settings, "shadow_policy_version", "v1")
+    monkeypatch.setattr(settings, "shadow_sample_rate", 1.0)
+    assert shadow.should_shadow()
+
+    monkeypatch.setattr(settings, "shadow_sample_rate", 0.0)
+    assert not shadow.should_shadow()
+
+    monkeypatch.setattr(settings, "shadow_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "shadow_policy_version", "v0")
+    assert not shadow.should_shadow()
+
+    monkeypatch.setattr(settings, "shadow_policy_version", "")
+    assert not shadow.should_shadow()
+
+
+def test_flush_loop_writes_on_timer_without_new_samples(monkeypatch, fresh_aggregator, db_rows):
+    fresh_aggregator.record("pre_query", ALLOWED, BLOCKED, 1.0, 1.0)
+    monkeypatch.setattr(shadow, "_flush_stop", threading.Event())
+    flusher = threading.Thread(target=shadow._flush_loop, args=(0.01,), daemon=True)
+    flusher.start()
+    for _ in range(200):
+        if db_rows:
+            break
+        threading.Event().wait(0.01)
+    shadow._flush_stop.set()
+    flusher.join(timeout=1)
+
+    assert len(db_rows) == 1
+    assert db_rows[0][1][3] == "shadow_eval"
+    assert fresh_aggregator.snapshot()["stages"] == {}
+
+
+def test_start_shadow_flusher_is_noop_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "shadow_policy_version", "")
+    monkeypatch.setattr(shadow, "_flusher", None)
+    shadow.start_shadow_flusher()
+    assert shadow._flusher is None
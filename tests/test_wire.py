@@ -0,0 +1,117 @@
+import httpx
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.core.wire import policy_context_ref, wants_msgpack
+from backend.app.policies import evaluator
+from sdk.python.gatekeeper_sdk import client as sdk_client
+from sdk.python.gatekeeper_sdk import GateKeeperClient
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setattr(evaluator, "fetch_policies_for_stage", lambda stage, version: [])
+    monkeypatch.setattr(main, "fetch_applicable_distilled_prompts", lambda stage, user, request: ["No salaries."])
+    return TestClient(main.app)
+
+
+ENFORCE = {"stage": "pre_query", "user": {"role": "nurse", "department": "ICU"}, "request": {"query": "hi"}}
+
+
+def test_wants_msgpack():
+    assert wants_msgpack("application/msgpack")
+    assert wants_msgpack("application/x-msgpack, application/json;q=0.5")
+    assert wants_msgpack("application/json, application/msgpack; q=0.1")
+    assert not wants_msgpack("application/msgpack;q=0")
+    assert not wants_msgpack("application/msgpack; q=0.0, application/json")
+    assert not wants_msgpack("application/json")
+    assert not wants_msgpack(None)
+
+
+def test_policy_context_ref_is_key_order_independent():
+    a = {"instruction": "x", "rules": ["r1"]}
+    b = {"rules": ["r1"], "instruction": "x"}
+    assert policy_context_ref(a) == policy_context_ref(b)
+    assert policy_context_ref(a) != policy_context_ref({"instruction": "x", "rules": ["r2"]})
+
+
+def test_enforce_omits_policy_context_when_ref_matches(api):
+    first = api.post("/v1/enforce", json=ENFORCE).json()
+    assert first["policyContext"]["rules"] == ["No salaries."]
+    assert first["policyContextRef"] == policy_context_ref(first["policyContext"])
+
+    cached = api.post("/v1/enforce", json={**ENFORCE, "policyContextRef": first["policyContextRef"]}).json()
+    assert cached["policyContext"] is None
+    assert cached["policyContextRef"] == first["policyContextRef"]
+
+    stale = api.post("/v1/enforce", json={**ENFORCE, "policyContextRef": "sha256:stale"}).json()
+    assert stale["policyContext"] == first["policyContext"]
+
+
+def test_enforce_msgpack_round_trip(api):
+    resp = api.post(
+        "/v1/enforce",
+        content=msgpack.packb(ENFORCE, use_bin_type=True),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/msgpack"
+    body = msgpack.unpackb(resp.content, raw=False)
+    assert body["decision"] == "allowed"
+    assert body["policyContext"]["rules"] == ["No salaries."]
+
+
+def test_enforce_keeps_structured_422(api):
+    resp = api.post("/v1/enforce", json={"stage": "nope"})
+    assert resp.status_code == 422
+    assert resp.json()["detail"][0]["loc"] == ["body", "stage"]
+
+    resp = api.post("/v1/enforce", content=b"{not json", headers={"Content-Type": "application/json"})
+    assert resp.status_code == 422
+    assert resp.json()["detail"][0]["type"] == "json_invalid"
+
+    resp = api.post("/v1/enforce", content=b"\xc1", headers={"Content-Type": "application/msgpack"})
+    assert resp.status_code == 422
+    assert resp.json()["detail"][0]["type"] == "msgpack_invalid"
+
+
+@pytest.mark.parametrize("payload, loc", [
+    ({"stage": b"\xff\xfe"}, ["body", "stage"]),
+    ({"stage": "pre_query", "user": [b"\xff"]}, ["body", "user", 0]),
+    ({"stage": "pre_retrieval", "request": {"filters": {"k": b"\xff"}}}, ["body", "request", "filters", "k"]),
+    ({"stage": "pre_query", "user": {b"role": "x"}}, ["body", "user"]),
+])
+def test_enforce_rejects_msgpack_bin_values(api, payload, loc):
+    resp = api.post("/v1/enforce", content=msgpack.packb(payload, use_bin_type=True), headers={"Content-Type": "application/msgpack"})
+    assert resp.status_code == 422
+    assert resp.json()["detail"][0]["type"] == "msgpack_unsupported_type"
+    assert resp.json()["detail"][0]["loc"] == loc
+
+
+def test_enforce_openapi_documents_request_body(api):
+    body = api.get("/openapi.json").json()["paths"]["/v1/enforce"]["post"]["requestBody"]
+    assert set(body["content"]) == {"application/json", "application/msgpack"}
+    assert "stage" in body["content"]["application/json"]["schema"]["properties"]
+
+
+def test_sdk_fills_policy_context_from_cache(monkeypatch):
+    context = {"instruction": "x", "rules": ["No salaries."]}
+    ref = policy_context_ref(context)
+    sent = []
+
+    def fake_post(url, json=None, timeout=None, **kwargs):
+        sent.append(json)
+        known = json.get("policyContextRef") == ref
+        body = {"decision": "allowed", "policyContextRef": ref, "policyContext": None if known else context}
+        return httpx.Response(200, json=body, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(sdk_client.httpx, "post", fake_post)
+    gk = GateKeeperClient("http://gk")
+    user = {"role": "nurse", "department": "ICU"}
+
+    assert gk.enforce("pre_query", user, {})["policyContext"] == context
+    assert gk.enforce("pre_query", user, {})["policyContext"] == context
+    assert sent[0]["policyContextRef"] is None
+    assert sent[1]["policyContextRef"] == ref